@@ -3,7 +3,6 @@
 import asyncio
 
 from aiohttp import ClientConnectorError, ClientError
-import pybeoplay
 import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
@@ -12,7 +11,9 @@ from homeassistant.const import CONF_HOST
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
-from .const import CONF_BEOPLAY_API, DOMAIN
+from .const import CONF_BEOPLAY_API, CONF_TIMEOUT_SETUP, DOMAIN
+from .api import LimitedBeoPlay
+from .limiter import request_deadline
 
 CONFIG_SCHEMA = vol.Schema({DOMAIN: vol.Schema({})}, extra=vol.ALLOW_EXTRA)
 
@@ -34,10 +35,12 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     # this is the connection manager with the actual speaker/TV
     polling_session = async_get_clientsession(hass)
     host = entry.data[CONF_HOST]
-    api = pybeoplay.BeoPlay(host, polling_session)
+    api = LimitedBeoPlay(host, polling_session)
+    api.timeouts.update(entry.options)
     try:
-        await api.async_get_device_info()
-    except (ClientError, ClientConnectorError) as ex:
+        with request_deadline(api.timeouts[CONF_TIMEOUT_SETUP], CONF_TIMEOUT_SETUP):
+            await api.async_get_device_info()
+    except (ClientError, ClientConnectorError, asyncio.TimeoutError) as ex:
         raise ConfigEntryNotReady(
             f"Cannot connect to {host}, is it in power saving mode?"
         ) from ex
@@ -46,10 +49,17 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
         hass.data[DOMAIN] = {}
     hass.data[DOMAIN][entry.entry_id] = {CONF_BEOPLAY_API: api, CONF_HOST: host}
 
+    entry.async_on_unload(entry.add_update_listener(_async_update_options))
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
+async def _async_update_options(hass: HomeAssistant, entry: ConfigEntry):
+    """Apply the new deadlines, without reloading the entry."""
+    hass.data[DOMAIN][entry.entry_id][CONF_BEOPLAY_API].timeouts.update(entry.options)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Unload a config entry."""
     unload_ok = all(
@@ -63,5 +73,9 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
 
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
+        if not hass.data[DOMAIN]:
+            # the services are shared by all the devices, remove them with the last one
+            for service in hass.services.async_services().get(DOMAIN, {}):
+                hass.services.async_remove(DOMAIN, service)
 
     return unload_ok
@@ -0,0 +1,139 @@
+"""Connection to a BeoPlay device, as used by the integration.
+
+It extends the pybeoplay connection: requests go through the adaptive limiter
+and have deadlines, lists are only fetched again when they changed, and a few
+pybeoplay bugs are fixed.
+"""
+
+import asyncio
+from collections import deque
+import hashlib
+import json
+import time
+
+import pybeoplay
+from pybeoplay.const import BASE_URL, BEOPLAY_URL_SET_VOLUME
+
+from .const import CONF_TIMEOUT_COMMAND, CONF_TIMEOUT_METADATA, DEFAULT_TIMEOUTS
+from .limiter import AdaptiveLimiter, prune_recent, request_timeout
+
+
+class LimitedBeoPlay(pybeoplay.BeoPlay):
+    """BeoPlay connection whose requests go through an adaptive limiter.
+
+    The notification stream is a long-lived connection that doesn't use
+    async_getReq, so it doesn't hold a slot and has no deadline.
+    """
+
+    def __init__(self, host, session=None) -> None:
+        """Initialize the connection and its limiter."""
+        super().__init__(host, session)
+        self.limiter = AdaptiveLimiter()
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.timeout_counts = dict.fromkeys(DEFAULT_TIMEOUTS, 0)
+        # times of the timeouts in the recent window, by operation
+        self._timeout_times = {operation: deque() for operation in DEFAULT_TIMEOUTS}
+        self._validators = {}  # path -> (ETag, Last-Modified, digest of the body)
+        self._prefetched = {}  # path -> changed body, for the next async_getReq
+
+    @property
+    def recent_timeout_counts(self) -> dict:
+        """Return the number of timeouts in the recent window, by operation."""
+        for times in self._timeout_times.values():
+            prune_recent(times)
+        return {
+            operation: len(times) for operation, times in self._timeout_times.items()
+        }
+
+    async def async_getReq(self, path):
+        """Non blocking GET call to the device, when a slot is free."""
+        if path in self._prefetched:
+            return self._prefetched.pop(path)
+        return await self._async_request(
+            CONF_TIMEOUT_METADATA, super().async_getReq, path
+        )
+
+    async def async_postReq(self, type, path, jsondata: dict = {}):
+        """Non blocking PUT, POST or DELETE call to the device, when a slot is free."""
+        return await self._async_request(
+            CONF_TIMEOUT_COMMAND, super().async_postReq, type, path, jsondata
+        )
+
+    async def async_get_changed(self, path) -> bool:
+        """Return True if the resource at `path` changed since the last call.
+
+        The request is conditional when the device sent validators, and the
+        body is compared otherwise. A changed body is kept for the next
+        async_getReq of `path`, so the pybeoplay getter applies it without
+        another request.
+        """
+        return await self._async_request(
+            CONF_TIMEOUT_METADATA, self._async_get_changed, path
+        )
+
+    async def _async_get_changed(self, path) -> bool:
+        """Fetch `path`, unless it is unchanged."""
+        etag, last_modified, digest = self._validators.get(path, (None, None, None))
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        async with self._clientsession.get(
+            BASE_URL.format(self.host, path), headers=headers
+        ) as resp:
+            if resp.status != 200:
+                return False
+            body = await resp.read()
+            self._validators[path] = (
+                resp.headers.get("ETag"),
+                resp.headers.get("Last-Modified"),
+                hashlib.sha1(body).hexdigest(),
+            )
+        if self._validators[path][2] == digest:
+            return False
+        try:
+            self._prefetched[path] = json.loads(body)
+        except ValueError:
+            # not a list the getter could apply: fetch it again next time
+            del self._validators[path]
+            return False
+        return True
+
+    async def async_set_volume(self, volume):
+        """Set the volume (0..1), rounded to the nearest device level.
+
+        pybeoplay truncates the level, so e.g. 0.29 would be sent as 28.
+        """
+        self.volume = volume
+        await self.async_postReq(
+            "PUT", BEOPLAY_URL_SET_VOLUME, {"level": round(volume * 100)}
+        )
+
+    async def async_get_sound_modes(self):
+        """Return the available sound modes, dropping the ones that are gone."""
+        sound_modes = self._soundModes
+        self._soundModes = {}
+        result = None
+        try:
+            result = await super().async_get_sound_modes()
+        finally:
+            if result is None:
+                self._soundModes = sound_modes
+        return result
+
+    async def _async_request(self, operation, request, *args):
+        """Make a request within its deadline, waiting for the slot included."""
+        deadline, operation = request_timeout(self.timeouts, operation)
+        try:
+            async with asyncio.timeout_at(deadline) as timeout:
+                async with self.limiter.request():
+                    return await request(*args)
+        except TimeoutError:
+            self.timeout_counts[operation] += 1
+            self._timeout_times[operation].append(time.monotonic())
+            prune_recent(self._timeout_times[operation])
+            if timeout.expired():
+                # the limiter only sees the cancellation of the request
+                self.limiter.record_error()
+            raise
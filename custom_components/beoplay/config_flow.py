@@ -1,4 +1,5 @@
 """Config flow for BeoPlay for Bang & Olufsen."""
+import asyncio
 import ipaddress
 import logging
 import re
@@ -9,10 +10,19 @@ import voluptuous as vol
 
 from homeassistant import config_entries, exceptions
 from homeassistant.const import CONF_HOST
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import AbortFlow
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
-from .const import BEOPLAY_TRACK, BEOPLAY_TYPES, CONF_TYPE, DOMAIN
+from .const import (
+    BEOPLAY_TRACK,
+    BEOPLAY_TYPES,
+    CONF_TIMEOUT_SETUP,
+    CONF_TYPE,
+    DATA_DISCOVERY_CACHE,
+    DEFAULT_TIMEOUTS,
+    DOMAIN,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -41,6 +51,15 @@ def host_valid(host):
         return all(x and not disallowed.search(x) for x in host.split("."))
 
 
+def host_is_address(host):
+    """Return True if host is an IP address rather than a hostname."""
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
 class BeoPlayConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for BeoPlay device."""
 
@@ -52,6 +71,12 @@ class BeoPlayConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self.beoplayapi = None
         self.host = None
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Get the options flow for this handler."""
+        return BeoPlayOptionsFlow()
+
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
         errors = {}
@@ -66,16 +91,24 @@ class BeoPlayConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     user_input[CONF_HOST], async_get_clientsession(self.hass)
                 )
 
-                await self.beoplayapi.async_get_device_info()
+                async with asyncio.timeout(DEFAULT_TIMEOUTS[CONF_TIMEOUT_SETUP]):
+                    await self.beoplayapi.async_get_device_info()
                 title = f"{self.beoplayapi.name}"
 
                 await self.async_set_unique_id(self.beoplayapi.serialNumber)
                 self._abort_if_unique_id_configured()
+                if not host_is_address(user_input[CONF_HOST]):
+                    self._remember_device(user_input[CONF_HOST])
 
                 return self.async_create_entry(title=title, data=user_input)
             except InvalidHost:
                 errors[CONF_HOST] = "wrong_host"
-            except (ConnectionError, ConnectionRefusedError, ClientError):
+            except (
+                ConnectionError,
+                ConnectionRefusedError,
+                ClientError,
+                asyncio.TimeoutError,
+            ):
                 errors["base"] = "cannot_connect"
             except AbortFlow:
                 return self.async_abort(reason="single_instance_allowed")
@@ -109,13 +142,23 @@ class BeoPlayConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self.host = discovery_info.hostname.rstrip(".")
         _LOGGER.debug("Async_Step_Zeroconf Hostname %s", self.host)
 
+        # B&O devices re-announce often: abort for known devices before any network I/O
+        hosts = [self.host, *[str(ip) for ip in discovery_info.ip_addresses]]
+        try:
+            await self._async_abort_if_known_device(
+                hosts, str(discovery_info.ip_address)
+            )
+        except AbortFlow as err:
+            return self.async_abort(reason=err.reason)
+
         self.beoplayapi = beoplay.BeoPlay(self.host, async_get_clientsession(self.hass))
         if self.beoplayapi is None:
             _LOGGER.debug("Could not create BeoPlay API for %s", str(self.host))
             return self.async_abort(reason="cannot_connect")
         
         try:
-            await self.beoplayapi.async_get_device_info()
+            async with asyncio.timeout(DEFAULT_TIMEOUTS[CONF_TIMEOUT_SETUP]):
+                await self.beoplayapi.async_get_device_info()
         except ClientError:
             _LOGGER.debug(
                 "Could not connect with %s as %s",
@@ -134,6 +177,8 @@ class BeoPlayConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         # Check if already configured
         sn = self.beoplayapi.serialNumber
         _LOGGER.debug("Async_Step_Zeroconf Set unique Id %s", sn)
+        if sn is not None:
+            self._remember_device(self.host)
 
         try:
             if sn is not None:
@@ -142,7 +187,10 @@ class BeoPlayConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     _LOGGER.debug(
                         "Async_Step_Zeroconf current entries: %s", elem.unique_id
                     )
-                self._abort_if_unique_id_configured()
+                # the device may have moved to a new address
+                self._abort_if_unique_id_configured(
+                    updates=self._host_updates(sn, str(discovery_info.ip_address))
+                )
         except AbortFlow:
             return self.async_abort(reason="single_instance_allowed")
         if sn is None:
@@ -159,6 +207,44 @@ class BeoPlayConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         )
         return await self.async_step_zeroconf_confirm()
 
+    def _remember_device(self, hostname):
+        """Remember which serial number answers on this hostname.
+
+        Addresses aren't remembered: DHCP may give the address of a device
+        that moved to another device.
+        """
+        cache = self.hass.data.setdefault(DATA_DISCOVERY_CACHE, {})
+        cache[hostname] = self.beoplayapi.serialNumber
+
+    async def _async_abort_if_known_device(self, hosts, address):
+        """Abort if an announced hostname or address belongs to a known device.
+
+        Configured entries whose device moved to a new address are updated with
+        the new host. Devices that were seen but not configured only get their
+        unique id set, so duplicate flows are aborted before contacting them.
+        """
+        for entry in self._async_current_entries(include_ignore=False):
+            if entry.data.get(CONF_HOST) in hosts:
+                raise AbortFlow("already_configured")
+
+        # only the hostname identifies the device, an address may be reused
+        sn = self.hass.data.get(DATA_DISCOVERY_CACHE, {}).get(self.host)
+        if sn is None:
+            return
+        _LOGGER.debug("Async_Step_Zeroconf known device %s at %s", sn, hosts)
+
+        await self.async_set_unique_id(sn)
+        self._abort_if_unique_id_configured(updates=self._host_updates(sn, address))
+
+    def _host_updates(self, sn, address):
+        """Return the new host of the entry of device `sn`, if it is configured."""
+        for entry in self._async_current_entries(include_ignore=False):
+            if entry.unique_id == sn and CONF_HOST in entry.data:
+                # keep the format the user configured: address or hostname
+                host = address if host_is_address(entry.data[CONF_HOST]) else self.host
+                return {CONF_HOST: host}
+        return None
+
     async def async_step_zeroconf_confirm(self, user_input=None):
         """Handle a flow initiated by zeroconf."""
 
@@ -190,5 +276,27 @@ class BeoPlayConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         )
 
 
+class BeoPlayOptionsFlow(config_entries.OptionsFlow):
+    """Handle the deadlines of the requests to a BeoPlay device."""
+
+    async def async_step_init(self, user_input=None):
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(key, default=options.get(key, default)): vol.All(
+                        vol.Coerce(float), vol.Range(min=1, max=120)
+                    )
+                    for key, default in DEFAULT_TIMEOUTS.items()
+                }
+            ),
+        )
+
+
 class InvalidHost(exceptions.HomeAssistantError):
     """Error to indicate that hostname/IP address is invalid."""
@@ -8,4 +8,20 @@ BEOPLAY_TYPES = [BEOPLAY_CHANNEL, BEOPLAY_TRACK]
 CONF_TYPE = "type"
 
 BEOPLAY_NOTIFICATION = "beoplay_notification"
+BEOPLAY_QUEUE_PROGRESS = "beoplay_queue_progress"
 CONF_BEOPLAY_API = "pybeoplay_api"
+
+# Maps hostnames and addresses announced over zeroconf to device serial numbers
+DATA_DISCOVERY_CACHE = "beoplay_discovery_cache"
+
+# Deadlines of the requests to the devices, in seconds, by operation
+CONF_TIMEOUT_SETUP = "timeout_setup"
+CONF_TIMEOUT_COMMAND = "timeout_command"
+CONF_TIMEOUT_METADATA = "timeout_metadata"
+CONF_TIMEOUT_POLL = "timeout_poll"
+DEFAULT_TIMEOUTS = {
+    CONF_TIMEOUT_SETUP: 10,
+    CONF_TIMEOUT_COMMAND: 5,
+    CONF_TIMEOUT_METADATA: 10,
+    CONF_TIMEOUT_POLL: 5,
+}
@@ -0,0 +1,26 @@
+"""Diagnostics support for BeoPlay for Bang & Olufsen."""
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_BEOPLAY_API, DOMAIN
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    api = data[CONF_BEOPLAY_API]
+    return {
+        "host": data[CONF_HOST],
+        "name": api.name,
+        "type_number": api.typeNumber,
+        "software_version": api.softwareVersion,
+        "limiter": api.limiter.as_dict(),
+        "timeouts": api.timeouts,
+        "timeout_counts": api.timeout_counts,
+    }
@@ -0,0 +1,240 @@
+"""Adaptive limit of the concurrent requests made to a BeoPlay device.
+
+The embedded HTTP servers of B&O devices only handle a few requests at a time.
+The limit on the requests in flight grows while the device answers quickly, and
+is halved when it slows down or fails (additive increase, multiplicative
+decrease). Commands are let through before background polls.
+
+Every request also has a deadline, which depends on the operation it is part
+of. A service call can give all its requests one common deadline, which the
+tasks it fans out to inherit.
+"""
+
+import asyncio
+from collections import deque
+from collections.abc import Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+import heapq
+import itertools
+import time
+
+from aiohttp import ClientError
+
+from .const import CONF_TIMEOUT_COMMAND, CONF_TIMEOUT_POLL
+
+PRIORITY_COMMAND = 0
+PRIORITY_POLL = 1
+
+INITIAL_LIMIT = 2
+MIN_LIMIT = 1
+MAX_LIMIT = 4
+# answers slower than this (in seconds) mean the device is overloaded
+TARGET_LATENCY = 1.0
+# weight of the last request in the average latency
+LATENCY_SMOOTHING = 0.2
+# errors and timeouts are also counted over this many seconds
+RECENT_WINDOW = 300
+
+_PRIORITY: ContextVar[int] = ContextVar("beoplay_priority", default=PRIORITY_COMMAND)
+# operation of the requests of the current context, whatever their priority
+_OPERATION: ContextVar[str | None] = ContextVar("beoplay_operation", default=None)
+# (loop time, operation) of the deadline of the current context
+_DEADLINE: ContextVar[tuple[float, str] | None] = ContextVar(
+    "beoplay_deadline", default=None
+)
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Make the requests of the current task wait behind the commands."""
+    token = _PRIORITY.set(PRIORITY_POLL)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+@contextmanager
+def request_operation(operation: str) -> Iterator[None]:
+    """Make the requests of the current task use the deadline of `operation`.
+
+    Background requests otherwise use the poll deadline.
+    """
+    token = _OPERATION.set(operation)
+    try:
+        yield
+    finally:
+        _OPERATION.reset(token)
+
+
+@contextmanager
+def request_deadline(
+    timeout: float | None, operation: str = CONF_TIMEOUT_COMMAND
+) -> Iterator[None]:
+    """Give the device requests made in this context a common deadline.
+
+    An earlier deadline of the enclosing context is kept. A timeout of None
+    lifts the deadline, for background tasks started from a service call.
+    """
+    deadline = None
+    if timeout is not None:
+        deadline = (asyncio.get_running_loop().time() + timeout, operation)
+        current = _DEADLINE.get()
+        if current is not None and current[0] < deadline[0]:
+            deadline = current
+    token = _DEADLINE.set(deadline)
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+async def detached(coro):
+    """Run a background task without the deadline of the call that started it."""
+    with request_deadline(None):
+        return await coro
+
+
+def request_timeout(timeouts: dict, operation: str) -> tuple[float, str]:
+    """Return the (loop time, operation) deadline of a request of `operation`.
+
+    The operation of the context, or the poll operation for background
+    requests, replaces `operation`, and an earlier deadline of the context
+    is kept.
+    """
+    if _OPERATION.get() is not None:
+        operation = _OPERATION.get()
+    elif _PRIORITY.get() == PRIORITY_POLL:
+        operation = CONF_TIMEOUT_POLL
+    deadline = asyncio.get_running_loop().time() + timeouts[operation]
+    context_deadline = _DEADLINE.get()
+    if context_deadline is not None and context_deadline[0] < deadline:
+        return context_deadline
+    return deadline, operation
+
+
+def prune_recent(times: deque) -> None:
+    """Drop the times older than the recent window from the left of `times`."""
+    oldest = time.monotonic() - RECENT_WINDOW
+    while times and times[0] < oldest:
+        times.popleft()
+
+
+class AdaptiveLimiter:
+    """Limit on the requests in flight to one device, adapted to its latency."""
+
+    def __init__(
+        self,
+        initial_limit: int = INITIAL_LIMIT,
+        min_limit: int = MIN_LIMIT,
+        max_limit: int = MAX_LIMIT,
+        target_latency: float = TARGET_LATENCY,
+    ) -> None:
+        """Initialize the limiter."""
+        self._limit = float(initial_limit)
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._target_latency = target_latency
+        self._in_flight = 0
+        self._waiters = []  # heap of (priority, sequence, future)
+        self._sequence = itertools.count()
+        self._last_decrease = 0.0
+        self.requests = 0
+        self.errors = 0
+        self._error_times = deque()  # of the errors in the recent window
+        self.latency = None  # average latency, in seconds
+
+    @property
+    def limit(self) -> int:
+        """Return the number of requests allowed in flight."""
+        return max(self._min_limit, int(self._limit))
+
+    @asynccontextmanager
+    async def request(self, priority: int | None = None):
+        """Hold a slot for the duration of one request to the device."""
+        if priority is None:
+            priority = _PRIORITY.get()
+        await self._acquire(priority)
+        start = time.monotonic()
+        try:
+            yield
+        except (asyncio.TimeoutError, ClientError):
+            self.record_error()
+            raise
+        else:
+            self._record_latency(time.monotonic() - start)
+        finally:
+            self.requests += 1
+            self._in_flight -= 1
+            self._wake_waiters()
+
+    async def _acquire(self, priority: int) -> None:
+        """Wait for a free slot. Waiters are served by priority, then in order."""
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        # only cancelled waiters may be ahead of us
+        self._wake_waiters()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # the slot was handed over just before the cancellation
+                self._in_flight -= 1
+                self._wake_waiters()
+            raise
+
+    def _wake_waiters(self) -> None:
+        """Hand the free slots over to the waiters."""
+        while self._waiters and self._in_flight < self.limit:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._in_flight += 1
+            future.set_result(None)
+
+    @property
+    def recent_errors(self) -> int:
+        """Return the number of failed requests in the recent window."""
+        prune_recent(self._error_times)
+        return len(self._error_times)
+
+    def record_error(self) -> None:
+        """Shrink the limit after a failed request."""
+        self.errors += 1
+        self._error_times.append(time.monotonic())
+        prune_recent(self._error_times)
+        self._decrease()
+
+    def _record_latency(self, latency: float) -> None:
+        """Grow the limit while the device is fast, shrink it when it's slow."""
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+        if self.latency > self._target_latency:
+            self._decrease()
+        else:
+            self._limit = min(self._max_limit, self._limit + 1 / self._limit)
+
+    def _decrease(self) -> None:
+        """Halve the limit, at most once per target latency."""
+        now = time.monotonic()
+        if now - self._last_decrease < self._target_latency:
+            return
+        self._last_decrease = now
+        self._limit = max(self._min_limit, self._limit / 2)
+
+    def as_dict(self) -> dict:
+        """Return the state of the limiter, for diagnostics."""
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "waiting": sum(1 for *_, future in self._waiters if not future.done()),
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency": self.latency,
+        }
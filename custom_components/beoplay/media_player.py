@@ -12,26 +12,44 @@ Key features:
 
 import asyncio
 from asyncio import CancelledError
-from datetime import timedelta
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import heapq
 import logging
+from typing import NamedTuple
 import urllib.parse
 
-from aiohttp import ClientError
+from aiohttp import ClientError, ClientTimeout
 import pybeoplay
+from pybeoplay.const import (
+    BEOPLAY_URL_GET_SOUND_MODE,
+    BEOPLAY_URL_GET_SOURCES,
+    BEOPLAY_URL_PLAYQUEUE,
+    BEOPLAY_URL_STAND,
+)
 import voluptuous as vol
 
+from homeassistant.components import media_source
 from homeassistant.components.media_player import (
+    ATTR_MEDIA_VOLUME_LEVEL,
+    BrowseMedia,
+    MediaClass,
     MediaPlayerEntity,
     MediaPlayerEntityFeature,
     MediaType,
     RepeatMode,
 )
+from homeassistant.components.media_player.browse_media import (
+    async_process_play_media_url,
+)
+from homeassistant.components.media_player.errors import BrowseError
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
     ATTR_ENTITY_ID,
     CONF_ID,
+    CONF_TIMEOUT,
     CONF_URL,
-    EVENT_HOMEASSISTANT_START,
     EVENT_HOMEASSISTANT_STOP,
     STATE_OFF,
     STATE_ON,
@@ -39,22 +57,42 @@ from homeassistant.const import (
     STATE_PLAYING,
     STATE_UNKNOWN,
 )
-from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, callback
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
 
 # from homeassistant.helpers.script import Script
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.start import async_at_started
 
 # from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.util import Throttle
+import homeassistant.util.dt as dt_util
 
 from .const import (
     BEOPLAY_CHANNEL,
     BEOPLAY_NOTIFICATION,
+    BEOPLAY_QUEUE_PROGRESS,
     CONF_BEOPLAY_API,
+    CONF_TIMEOUT_COMMAND,
+    CONF_TIMEOUT_METADATA,
+    CONF_TIMEOUT_SETUP,
     CONF_TYPE,
+    DEFAULT_TIMEOUTS,
     DOMAIN,
 )
+from .limiter import (
+    background_priority,
+    detached,
+    request_deadline,
+    request_operation,
+)
 
 REQUIREMENTS = ["pybeoplay"]
 
@@ -66,6 +104,19 @@ MIN_TIME_BETWEEN_UPDATES = timedelta(
 
 CHECK_TIMEOUT = 5
 
+# how often to check whether the sources, sound modes and stand positions changed
+CATALOGUE_REFRESH_INTERVAL = timedelta(minutes=5)
+# the lists of the device, and the pybeoplay getters that apply them
+CATALOGUES = (
+    (BEOPLAY_URL_GET_SOURCES, "async_get_sources"),
+    (BEOPLAY_URL_GET_SOUND_MODE, "async_get_sound_modes"),
+    (BEOPLAY_URL_STAND, "async_get_stand_positions"),
+)
+
+# a progress notification further than this from the interpolated position
+# (in seconds) is a seek, and moves the anchor of the position
+POSITION_DRIFT_TOLERANCE = 2
+
 SUPPORT_BEOPLAY = (
     MediaPlayerEntityFeature.PAUSE
     | MediaPlayerEntityFeature.VOLUME_SET
@@ -80,6 +131,7 @@ SUPPORT_BEOPLAY = (
     | MediaPlayerEntityFeature.SELECT_SOURCE
     | MediaPlayerEntityFeature.SELECT_SOUND_MODE
     | MediaPlayerEntityFeature.GROUPING
+    | MediaPlayerEntityFeature.BROWSE_MEDIA
 )
 
 DATA_BEOPLAY = "beoplay_media_player"
@@ -88,6 +140,36 @@ BEOPLAY_EXPERIENCE_JOIN_SERVICE = "beoplay_join_experience"
 BEOPLAY_EXPERIENCE_LEAVE_SERVICE = "beoplay_leave_experience"
 BEOPLAY_ADD_MEDIA_SERVICE = "beoplay_add_media_to_queue"
 BEOPLAY_SET_STAND_POSITION = "beoplay_set_stand_position"
+BEOPLAY_FADE_VOLUME_SERVICE = "beoplay_fade_volume"
+BEOPLAY_SNAPSHOT_SERVICE = "beoplay_snapshot"
+BEOPLAY_RESTORE_SERVICE = "beoplay_restore"
+BEOPLAY_FLEET_STATUS_SERVICE = "beoplay_fleet_status"
+BEOPLAY_NOTIFICATION_HISTORY_SERVICE = "beoplay_notification_history"
+BEOPLAY_POWER_SERVICE = "beoplay_power"
+
+ATTR_DURATION = "duration"
+ATTR_CURVE = "curve"
+ATTR_TYPE = "type"
+ATTR_SINCE = "since"
+ATTR_POWER = "power"
+ATTR_WAIT_READY = "wait_ready"
+
+FADE_CURVE_LINEAR = "linear"
+FADE_CURVE_EASE_IN = "ease_in"
+FADE_CURVE_EASE_OUT = "ease_out"
+FADE_CURVE_EASE_IN_OUT = "ease_in_out"
+FADE_CURVES = [
+    FADE_CURVE_LINEAR,
+    FADE_CURVE_EASE_IN,
+    FADE_CURVE_EASE_OUT,
+    FADE_CURVE_EASE_IN_OUT,
+]
+
+# minimum time between two volume writes during a fade. The embedded HTTP server
+# of the speakers doesn't keep up with faster updates.
+FADE_MIN_STEP_INTERVAL = 0.25
+# how long the echo of a level the fade moved past is still expected, in seconds
+FADE_ECHO_GRACE = 1.0
 
 EXPERIENCE_SCHEMA = vol.Schema(
     {
@@ -98,7 +180,7 @@ EXPERIENCE_SCHEMA = vol.Schema(
 ADD_MEDIA_SCHEMA = vol.Schema(
     {
         vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
-        vol.Required(CONF_URL): cv.url,
+        vol.Required(CONF_URL): vol.All(cv.ensure_list, [cv.url]),
     }
 )
 
@@ -109,10 +191,230 @@ SET_STAND_POSITION_SCHEMA = vol.Schema(
     }
 )
 
+FADE_VOLUME_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Required(ATTR_MEDIA_VOLUME_LEVEL): cv.small_float,
+        vol.Optional(ATTR_DURATION, default=10): vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=3600)
+        ),
+        vol.Optional(ATTR_CURVE, default=FADE_CURVE_LINEAR): vol.In(FADE_CURVES),
+    }
+)
+
+SNAPSHOT_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+    }
+)
+
+FLEET_STATUS_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Optional(CONF_TIMEOUT, default=5): vol.All(
+            vol.Coerce(float), vol.Range(min=0.5, max=60)
+        ),
+    }
+)
+
+NOTIFICATION_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Optional(ATTR_TYPE): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_SINCE): cv.datetime,
+    }
+)
+
+POWER_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Required(ATTR_POWER): vol.In([STATE_ON, STATE_OFF]),
+        vol.Optional(ATTR_WAIT_READY, default=False): cv.boolean,
+        vol.Optional(CONF_TIMEOUT, default=30): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=300)
+        ),
+    }
+)
+
 BEOPLAY_POLL_TASK = "BeoPlay Poll Task"
+BEOPLAY_FADE_TASK = "BeoPlay Volume Fade Task"
+BEOPLAY_QUEUE_TASK = "BeoPlay Queue Load Task"
+
+# fire a progress event every this many queued items
+QUEUE_PROGRESS_INTERVAL = 10
+PLAYLIST_TIMEOUT = 10
+PLAYLIST_EXTENSIONS = (".m3u", ".m3u8")
+
+# number of notifications kept per device for the history service
+NOTIFICATION_HISTORY_SIZE = 200
+# notifications that are only kept in the history, and not fired on the bus.
+# The position they carry is in the media position of the entity.
+HISTORY_ONLY_NOTIFICATIONS = ("PROGRESS_INFORMATION",)
+# they come every second, so they have their own, shorter, history and don't
+# push the other notifications out
+HISTORY_ONLY_NOTIFICATION_HISTORY_SIZE = 20
 
 JID_FORMAT = "{}.{}.{}@products.bang-olufsen.com"
 
+# media browser content ids and types
+BROWSE_ROOT = "root"
+BROWSE_SOURCES = "sources"
+BROWSE_QUEUE = "queue"
+MEDIA_TYPE_SOURCE = "source"
+MEDIA_TYPE_LIBRARY = "library"
+
+
+def _fade_curve(curve: str, fraction: float) -> float:
+    """Map the elapsed fraction of a fade (0..1) to the fraction of the volume change."""
+    if curve == FADE_CURVE_EASE_IN:
+        return fraction * fraction
+    if curve == FADE_CURVE_EASE_OUT:
+        return 1 - (1 - fraction) * (1 - fraction)
+    if curve == FADE_CURVE_EASE_IN_OUT:
+        if fraction < 0.5:
+            return 2 * fraction * fraction
+        return 1 - 2 * (1 - fraction) * (1 - fraction)
+    return fraction
+
+
+async def _async_expand_playlists(hass: HomeAssistant, urls):
+    """Replace the M3U playlists in `urls` with the URLs they list."""
+    expanded = []
+    for url in urls:
+        if not urllib.parse.urlparse(url).path.lower().endswith(PLAYLIST_EXTENSIONS):
+            expanded.append(url)
+            continue
+        try:
+            async with async_get_clientsession(hass).get(
+                url, timeout=ClientTimeout(total=PLAYLIST_TIMEOUT)
+            ) as resp:
+                resp.raise_for_status()
+                playlist = await resp.text()
+        except (asyncio.TimeoutError, ClientError) as _e:
+            _LOGGER.error("Couldn't fetch playlist %s: %s", url, str(_e))
+            continue
+        expanded.extend(
+            urllib.parse.urljoin(url, line.strip())
+            for line in playlist.splitlines()
+            if line.strip() and not line.lstrip().startswith("#")
+        )
+    return expanded
+
+
+def _audio_content(item: BrowseMedia) -> bool:
+    """Return True for the media source items the speakers can play."""
+    return item.media_content_type.startswith("audio/")
+
+
+def _ha_state(on, state):
+    """Map the power and playback state of the device to a media player state."""
+    if not on:
+        return STATE_OFF
+    if state is None:
+        return None
+
+    if state in ("play", "playing"):
+        return STATE_PLAYING
+    if state == "pause":
+        return STATE_PAUSED
+    if state == "stop":
+        return STATE_PAUSED
+    if on:
+        return STATE_ON
+    return STATE_UNKNOWN
+
+
+@dataclass(frozen=True, slots=True)
+class BeoPlayState:
+    """Immutable view of a speaker, built once per applied notification.
+
+    The entity properties are served from it, so derived values are computed
+    once per change and a state write never sees a half-applied notification.
+    Equal views mean there is nothing new to write.
+    """
+
+    on: bool
+    state: str | None
+    source: str | None
+    source_list: tuple[str, ...] | None
+    sound_mode: str | None
+    sound_mode_list: tuple[str, ...] | None
+    volume_level: float | None
+    is_volume_muted: bool | None
+    media_image_url: str | None
+    media_title: str | None
+    media_track: str | None
+    media_artist: str | None
+    media_album: str | None
+    listeners: tuple[str, ...]
+    extra_state_attributes: dict
+    media_position: int | None = None
+    media_duration: int | None = None
+    media_position_updated_at: datetime | None = None
+
+    @classmethod
+    def from_speaker(
+        cls, speaker: pybeoplay.BeoPlay, progress: "MediaProgress | None" = None
+    ) -> "BeoPlayState":
+        """Build the view from the current fields of the speaker."""
+        media_image_url = speaker.media_url or None
+        if media_image_url and speaker.source == "AirPlay":
+            media_url_params = urllib.parse.urlencode({"track": speaker.media_track})
+            media_image_url = f"{media_image_url}?{media_url_params}"
+        if speaker.source == "Google Cast":
+            media_title = speaker.media_album
+        else:
+            media_title = speaker.media_track or None
+
+        return cls(
+            on=bool(speaker.on),
+            state=_ha_state(speaker.on, speaker.state),
+            source=speaker.source or None,
+            source_list=tuple(speaker.sources) or None,
+            sound_mode=speaker.soundMode or None,
+            sound_mode_list=tuple(speaker.soundModes) or None,
+            volume_level=speaker.volume,
+            is_volume_muted=speaker.muted,
+            media_image_url=media_image_url,
+            media_title=media_title,
+            media_track=speaker.media_track or None,
+            media_artist=speaker.media_artist or None,
+            media_album=speaker.media_album or None,
+            listeners=tuple(getattr(speaker, "listeners", None) or ()),
+            extra_state_attributes={
+                "stand_positions": dict(speaker.standPositions),
+                "stand_position": speaker.standPosition,
+            },
+            media_position=progress.position if progress else None,
+            media_duration=progress.duration if progress else None,
+            media_position_updated_at=progress.updated_at if progress else None,
+        )
+
+
+class MediaProgress(NamedTuple):
+    """Playback position, as of the last play/pause/seek notification."""
+
+    position: int
+    duration: int | None
+    playing: bool
+    updated_at: datetime
+
+    def expected_position(self, now: datetime) -> float:
+        """Return the position interpolated at `now`."""
+        if not self.playing:
+            return self.position
+        return self.position + (now - self.updated_at).total_seconds()
+
+
+class PlaybackSnapshot(NamedTuple):
+    """Playback state of a device, as captured by the snapshot service."""
+
+    on: bool
+    source: str | None
+    volume: float | None
+    muted: bool | None
+    in_experience: bool
+
 
 class BeoPlayData:
     """Storage class for platform global data. This gets filled in by entity added to hass."""
@@ -122,10 +424,27 @@ class BeoPlayData:
         self.entities = []
 
 
-async def _add_player(
-    hass: HomeAssistant, async_add_devices, api: pybeoplay.BeoPlay, type
-):
-    """Add speakers."""
+@callback
+def _async_register_services(hass: HomeAssistant):
+    """Register the beoplay services, once for all the devices."""
+    if hass.services.has_service(DOMAIN, BEOPLAY_EXPERIENCE_JOIN_SERVICE):
+        return
+
+    def _command_timeout():
+        """Return the longest command deadline of the devices, in seconds."""
+        return max(
+            (e.command_timeout for e in hass.data[DATA_BEOPLAY].entities),
+            default=DEFAULT_TIMEOUTS[CONF_TIMEOUT_COMMAND],
+        )
+
+    def _with_deadline(handler):
+        """Give all the device requests of a service call one deadline."""
+
+        async def _handler(service: ServiceCall) -> ServiceResponse:
+            with request_deadline(_command_timeout()):
+                return await handler(service)
+
+        return _handler
 
     # the callbacks for the services
     async def join_experience(service: ServiceCall) -> ServiceResponse:
@@ -154,13 +473,17 @@ async def _add_player(
         """Leave an existing experience."""
         _LOGGER.debug("Add Media to Queue service called")
         entity_ids = service.data.get("entity_id")
-        url = service.data.get("url")
+        urls = await _async_expand_playlists(hass, service.data.get("url"))
         entities = hass.data[DATA_BEOPLAY].entities
 
         if entity_ids:
             entities = [e for e in entities if e.entity_id in entity_ids]
-        for entity in entities:
-            await entity.async_add_media(url)
+        if urls:
+            # the deadline starts once the playlists are fetched
+            with request_deadline(_command_timeout()):
+                await asyncio.gather(
+                    *[entity.async_load_queue(urls) for entity in entities]
+                )
 
     async def set_stand_positions(service: ServiceCall) -> ServiceResponse:
         """Join to an existing experience."""
@@ -174,28 +497,127 @@ async def _add_player(
         for entity in entities:
             await entity.async_set_stand_position(stand_position_id)
 
-    # the callbacks for starting / stopping the polling (Notifications) task
-    @callback
-    def _start_polling(event=None):
-        """Start polling."""
-        speaker.start_polling()
+    async def fade_volume(service: ServiceCall) -> ServiceResponse:
+        """Fade the volume to a target level."""
+        _LOGGER.debug("Fade volume service called")
+        entity_ids = service.data.get("entity_id")
+        entities = hass.data[DATA_BEOPLAY].entities
 
-    @callback
-    def _stop_polling(event=None):
-        """Stop polling."""
-        speaker.stop_polling()
+        if entity_ids:
+            entities = [e for e in entities if e.entity_id in entity_ids]
+        for entity in entities:
+            entity.async_fade_volume(
+                service.data[ATTR_MEDIA_VOLUME_LEVEL],
+                service.data[ATTR_DURATION],
+                service.data[ATTR_CURVE],
+            )
+
+    async def snapshot(service: ServiceCall) -> ServiceResponse:
+        """Take a snapshot of the playback state, from the cached state."""
+        _LOGGER.debug("Snapshot service called")
+        entity_ids = service.data.get("entity_id")
+        entities = hass.data[DATA_BEOPLAY].entities
+
+        if entity_ids:
+            entities = [e for e in entities if e.entity_id in entity_ids]
+        for entity in entities:
+            entity.snapshot()
+
+    async def restore(service: ServiceCall) -> ServiceResponse:
+        """Restore the snapshots, on all the devices at the same time.
+
+        Restoring takes a few commands in a row, so each of them has its own
+        command deadline rather than one for the whole call.
+        """
+        _LOGGER.debug("Restore service called")
+        entity_ids = service.data.get("entity_id")
+        entities = hass.data[DATA_BEOPLAY].entities
+
+        if entity_ids:
+            entities = [e for e in entities if e.entity_id in entity_ids]
+        await asyncio.gather(*[entity.async_restore() for entity in entities])
+
+    async def fleet_status(service: ServiceCall) -> ServiceResponse:
+        """Return the health of the devices, pinging them all at the same time."""
+        _LOGGER.debug("Fleet status service called")
+        entity_ids = service.data.get("entity_id")
+        entities = hass.data[DATA_BEOPLAY].entities
+
+        if entity_ids:
+            entities = [e for e in entities if e.entity_id in entity_ids]
+        # one deadline for all the pings
+        with request_deadline(service.data[CONF_TIMEOUT]):
+            statuses = await asyncio.gather(
+                *[entity.async_get_status() for entity in entities]
+            )
+        return {
+            "devices": {
+                entity.entity_id: status
+                for entity, status in zip(entities, statuses, strict=True)
+            }
+        }
+
+    async def notification_history(service: ServiceCall) -> ServiceResponse:
+        """Return the recent notifications of the devices, oldest first."""
+        _LOGGER.debug("Notification history service called")
+        entity_ids = service.data.get("entity_id")
+        entities = hass.data[DATA_BEOPLAY].entities
+        notification_types = service.data.get(ATTR_TYPE)
+        since = service.data.get(ATTR_SINCE)
+        if since is not None:
+            since = dt_util.as_utc(since)
+
+        if entity_ids:
+            entities = [e for e in entities if e.entity_id in entity_ids]
+        return {
+            "notifications": {
+                entity.entity_id: entity.notification_history(
+                    notification_types, since
+                )
+                for entity in entities
+            }
+        }
+
+    async def power(service: ServiceCall) -> ServiceResponse:
+        """Wake or standby the devices at the same time, waiting for their streams."""
+        _LOGGER.debug("Power service called")
+        entity_ids = service.data.get("entity_id")
+        entities = hass.data[DATA_BEOPLAY].entities
+        timeout = service.data[CONF_TIMEOUT]
+        deadline = asyncio.get_running_loop().time() + timeout
+
+        if entity_ids:
+            entities = [e for e in entities if e.entity_id in entity_ids]
+        # one deadline for the commands and the wait of all the devices
+        with request_deadline(timeout):
+            timings = await asyncio.gather(
+                *[
+                    entity.async_set_power(
+                        service.data[ATTR_POWER] == STATE_ON,
+                        service.data[ATTR_WAIT_READY],
+                        deadline,
+                    )
+                    for entity in entities
+                ]
+            )
+        return {
+            "devices": {
+                entity.entity_id: timing
+                for entity, timing in zip(entities, timings, strict=True)
+            }
+        }
 
     # Register the service callbacks
     hass.services.async_register(
         DOMAIN,
         BEOPLAY_EXPERIENCE_JOIN_SERVICE,
-        join_experience,
+        _with_deadline(join_experience),
         schema=EXPERIENCE_SCHEMA,
     )
     hass.services.async_register(
         DOMAIN,
         BEOPLAY_EXPERIENCE_LEAVE_SERVICE,
-        leave_experience,
+        _with_deadline(leave_experience),
         schema=EXPERIENCE_SCHEMA,
     )
     hass.services.async_register(
@@ -208,14 +630,66 @@ async def _add_player(
     hass.services.async_register(
         DOMAIN,
         BEOPLAY_SET_STAND_POSITION,
-        set_stand_positions,
+        _with_deadline(set_stand_positions),
         schema=SET_STAND_POSITION_SCHEMA,
     )
 
-    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _stop_polling)
+    hass.services.async_register(
+        DOMAIN,
+        BEOPLAY_FADE_VOLUME_SERVICE,
+        fade_volume,
+        schema=FADE_VOLUME_SCHEMA,
+    )
+
+    hass.services.async_register(
+        DOMAIN,
+        BEOPLAY_SNAPSHOT_SERVICE,
+        snapshot,
+        schema=SNAPSHOT_SCHEMA,
+    )
+
+    hass.services.async_register(
+        DOMAIN,
+        BEOPLAY_RESTORE_SERVICE,
+        restore,
+        schema=SNAPSHOT_SCHEMA,
+    )
+
+    hass.services.async_register(
+        DOMAIN,
+        BEOPLAY_FLEET_STATUS_SERVICE,
+        fleet_status,
+        schema=FLEET_STATUS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    hass.services.async_register(
+        DOMAIN,
+        BEOPLAY_NOTIFICATION_HISTORY_SERVICE,
+        notification_history,
+        schema=NOTIFICATION_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    hass.services.async_register(
+        DOMAIN,
+        BEOPLAY_POWER_SERVICE,
+        power,
+        schema=POWER_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+async def _add_player(
+    hass: HomeAssistant, async_add_devices, api: pybeoplay.BeoPlay, type
+):
+    """Add speakers."""
+
+    _async_register_services(hass)
 
     speaker = BeoPlay(hass, api, type)
-    await speaker.async_update()
+    with request_deadline(api.timeouts[CONF_TIMEOUT_SETUP], CONF_TIMEOUT_SETUP):
+        await speaker.async_update()
     # Only add the device if it responded with its serial number.
     # Device must be on. This avoids the creation of spurious devices.
     if speaker.unique_id == "":
@@ -224,10 +698,6 @@ async def _add_player(
 
     async_add_devices([speaker], True)
     _LOGGER.info("Added device with name: %s", speaker.name)
-    if hass.is_running:
-        _start_polling()
-    else:
-        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_START, _start_polling)
 
     return speaker
 
@@ -269,64 +739,188 @@ class BeoPlay(MediaPlayerEntity):
         self._jid = ""
         self._item_number = ""
         self._unique_id = ""
-        self._on = self._speaker.on
-        self._state = self._speaker.state
+        self._progress = None  # Anchor of the interpolated media position.
+        self._catalogues_checked_at = None  # Last check of the lists for changes.
+        self._stream_ready = asyncio.Event()  # Notifications arrive on the stream.
+        self._retry_now = asyncio.Event()  # Cuts the wait before the next retry.
+        self._wake_waiters = set()  # Events of the power service, set when awake.
+        self._last_notification_at = None
+        # (time received, notification) of the last notifications
+        self._notifications = deque(maxlen=NOTIFICATION_HISTORY_SIZE)
+        self._frequent_notifications = deque(
+            maxlen=HISTORY_ONLY_NOTIFICATION_HISTORY_SIZE
+        )
+        self._device_state = BeoPlayState.from_speaker(api)
         self._beoplay_type = type
 
+        self._fade_task = None  # The running volume fade, if any.
+        # Volume levels of the running fade whose echo is expected: the one in
+        # flight, the last one written, and the ones moved past shortly before,
+        # with the loop time they were moved past (None if they weren't).
+        self._fade_levels = None
+        self._playback_snapshot = None  # Taken by the snapshot service.
+        self._browse_cache = {}  # Media browser nodes, by content id.
+        # one lock per cached folder, so a slow play queue doesn't block the others
+        self._browse_locks = {
+            BROWSE_SOURCES: asyncio.Lock(),
+            BROWSE_QUEUE: asyncio.Lock(),
+        }
+        self._queue_task = None  # Loads the rest of a list of URLs in the queue.
+
     async def async_added_to_hass(self):
-        """Register entity."""
+        """Register entity and start polling the notifications once HA is running."""
         self.hass.data[DATA_BEOPLAY].entities.append(self)
 
+        @callback
+        def _start_polling(hass: HomeAssistant):
+            self.start_polling()
+
+        @callback
+        def _stop_polling(event=None):
+            self.stop_polling()
+
+        self.async_on_remove(async_at_started(self.hass, _start_polling))
+        self.async_on_remove(
+            self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _stop_polling)
+        )
+
     async def async_will_remove_from_hass(self):
         """Device is going to be removed, so stop polling the notifications."""
+        polling_task = self._polling_task
         self.stop_polling()
+        self.cancel_fade()
+        self.cancel_queue_load()
+        if polling_task is not None:
+            # wait for the notification stream connection to be closed
+            await asyncio.wait((polling_task,))
         self.hass.data[DATA_BEOPLAY].entities.remove(self)
 
     class _TimeoutException(Exception):
         pass
 
     async def _start_poll_command(self):
-        """Loop which polls the status of the speaker."""
-        try:
-            while True:
-                await self.async_update_status()
+        """Loop which polls the status of the speaker.
 
-        except (asyncio.TimeoutError, ClientError, BeoPlay._TimeoutException):
-            _LOGGER.info("Node %s is offline, retrying later", self._name)
-            await asyncio.sleep(CHECK_TIMEOUT)
-            self.start_polling()
-
-        except CancelledError:
-            _LOGGER.debug("Stopping the polling of node %s", self._name)
-        except Exception:
-            _LOGGER.exception("Unexpected error in %s", self._name)
-            raise
+        Retries are handled inside the loop, so there is only ever one polling
+        task per device and cancelling it stops the polling for good.
+        """
+        while True:
+            try:
+                if not await self.async_update_status():
+                    # the device refused the stream, don't hammer it
+                    await self._async_wait_retry()
+
+            except (asyncio.TimeoutError, ClientError, BeoPlay._TimeoutException):
+                _LOGGER.info("Node %s is offline, retrying later", self._name)
+                await self._async_wait_retry()
+
+            except CancelledError:
+                _LOGGER.debug("Stopping the polling of node %s", self._name)
+                raise
+            except Exception:
+                _LOGGER.exception("Unexpected error in %s", self._name)
+                raise
+
+    async def _async_wait_retry(self):
+        """Wait before reconnecting the stream, less if the device was just woken."""
+        try:
+            async with asyncio.timeout(CHECK_TIMEOUT):
+                await self._retry_now.wait()
+        except TimeoutError:
+            pass
+        self._retry_now.clear()
 
+    @callback
     def start_polling(self):
         """Start the polling task."""
+        if self._polling_task is not None and not self._polling_task.done():
+            return
         self._polling_task = self._hass.async_create_background_task(
             self._start_poll_command(), BEOPLAY_POLL_TASK
         )
 
+    @callback
     def stop_polling(self):
         """Stop the polling task."""
         if self._polling_task is not None:
             self._polling_task.cancel()
+            self._polling_task = None
+
+    @callback
+    def _apply_device_state(self) -> bool:
+        """Rebuild the state view from the speaker. Return True if it changed."""
+        device_state = BeoPlayState.from_speaker(self._speaker, self._progress)
+        if device_state == self._device_state:
+            return False
+        self._device_state = device_state
+        return True
+
+    @callback
+    def _update_progress(self, progress: dict):
+        """Move the anchor of the media position on play, pause or seek.
+
+        Other progress notifications match the interpolated position and are
+        ignored, so they don't cause state writes.
+        """
+        position = progress.get("position")
+        if position is None:
+            return
+        duration = progress.get("totalDuration") or None
+        playing = progress.get("state") in ("play", "playing")
+        now = dt_util.utcnow()
+        current = self._progress
+        if (
+            current is not None
+            and current.duration == duration
+            and current.playing == playing
+            and abs(position - current.expected_position(now))
+            <= POSITION_DRIFT_TOLERANCE
+        ):
+            return
+        self._progress = MediaProgress(position, duration, playing, now)
 
     async def async_update_status(self):
         """Long polling task."""
 
         def notif_callback(data: dict):
-            self._on = self._speaker.on
-            self._state = self._speaker.state
-            self.async_schedule_update_ha_state()
+            self._stream_ready.set()
+            self._last_notification_at = dt_util.utcnow()
+            notification_type = data.get("type", "")
+            if notification_type in HISTORY_ONLY_NOTIFICATIONS:
+                history = self._frequent_notifications
+            else:
+                history = self._notifications
+            history.append((self._last_notification_at, dict(data)))
+            if notification_type == "VOLUME":
+                self._check_fade_override()
+            elif notification_type == "PROGRESS_INFORMATION":
+                self._update_progress(data.get("data") or {})
+            elif notification_type in ("SOURCE", "NOW_PLAYING_ENDED"):
+                self._progress = None
+            if notification_type == "SOURCE" and data.get("data"):
+                # a source is active: the device is awake
+                for woken in self._wake_waiters:
+                    woken.set()
+            if (self._speaker.on and not self._device_state.on) or (
+                notification_type == "SOURCE"
+                and self._speaker.source
+                and self._speaker.source not in self._speaker.sources
+            ):
+                # turned on, or a source we don't know about:
+                # check the lists at the next update
+                self._catalogues_checked_at = None
+            self._invalidate_browse_cache(notification_type)
+            if self._apply_device_state():
+                self.async_schedule_update_ha_state()
+            if notification_type in HISTORY_ONLY_NOTIFICATIONS:
+                return
             # add the entity ID of the speaker to the notification so we know
             # where it's coming from
             data["entity_id"] = self.entity_id
             self._hass.add_job(self._notify_beoplay_notification, data)
 
         try:
-            await self._speaker.async_notificationsTask(notif_callback)
+            return await self._speaker.async_notificationsTask(notif_callback)
         except (TimeoutError, ClientError) as _e:
             # occasionally the notifications stream is closed by the speaker/TV
             # In that case, exit and restart the polling
@@ -335,6 +929,345 @@ class BeoPlay(MediaPlayerEntity):
                 self.async_schedule_update_ha_state()
             _LOGGER.info("Client error %s on %s", str(_e), self._name)
             raise
+        finally:
+            self._stream_ready.clear()
+
+    # ========== Volume fade ==========
+
+    @callback
+    def async_fade_volume(self, volume: float, duration: float, curve: str):
+        """Start fading the volume to `volume` (0..1) over `duration` seconds.
+
+        A running fade is cancelled and replaced by the new one.
+        """
+        self.cancel_fade()
+        self._fade_task = self._hass.async_create_background_task(
+            detached(self._async_fade(volume, duration, curve)), BEOPLAY_FADE_TASK
+        )
+
+    @callback
+    def cancel_fade(self):
+        """Cancel the running volume fade."""
+        if self._fade_task is not None:
+            self._fade_task.cancel()
+            self._fade_task = None
+
+    @callback
+    def _check_fade_override(self):
+        """Cancel the fade if the volume was changed by someone else.
+
+        The device echoes every level written by the fade as a VOLUME notification,
+        so any level other than the last one written, the one in flight, or one
+        moved past less than FADE_ECHO_GRACE ago (a slow echo), means the volume
+        was changed on the device or by another service call.
+        """
+        if self._fade_levels is None or self._speaker.volume is None:
+            return
+        level = round(self._speaker.volume * 100)
+        if level in self._fade_levels:
+            moved_past_at = self._fade_levels[level]
+            if (
+                moved_past_at is None
+                or asyncio.get_running_loop().time() - moved_past_at <= FADE_ECHO_GRACE
+            ):
+                return
+        _LOGGER.debug("Volume changed on %s, cancelling fade", self._name)
+        self.cancel_fade()
+
+    async def _async_fade(self, volume: float, duration: float, curve: str):
+        """Write the fade steps to the device, at most one in flight at a time."""
+        loop = asyncio.get_running_loop()
+        target_level = round(volume * 100)
+        start_level = (
+            round(self._speaker.volume * 100)
+            if self._speaker.volume is not None
+            else target_level
+        )
+        levels = {start_level: None}
+        self._fade_levels = levels
+        last_level = start_level
+        begin = loop.time()
+        try:
+            while True:
+                step_start = loop.time()
+                fraction = (
+                    min((step_start - begin) / duration, 1.0) if duration > 0 else 1.0
+                )
+                level = round(
+                    start_level
+                    + (target_level - start_level) * _fade_curve(curve, fraction)
+                )
+                if level != last_level:
+                    levels[level] = None
+                    await self._speaker.async_set_volume(level / 100)
+                    # after the grace, a return to a passed level is the user's
+                    now = loop.time()
+                    levels[last_level] = now
+                    for old_level, moved_past_at in list(levels.items()):
+                        if (
+                            moved_past_at is not None
+                            and now - moved_past_at > FADE_ECHO_GRACE
+                        ):
+                            del levels[old_level]
+                    last_level = level
+                if fraction >= 1.0:
+                    break
+                await asyncio.sleep(
+                    max(0, FADE_MIN_STEP_INTERVAL - (loop.time() - step_start))
+                )
+        except (asyncio.TimeoutError, ClientError) as _e:
+            _LOGGER.info("Volume fade on %s stopped: %s", self._name, str(_e))
+        finally:
+            if self._fade_levels is levels:
+                self._fade_levels = None
+
+    # ========== Snapshot / Restore ==========
+
+    @callback
+    def _in_experience(self) -> bool:
+        """Return True if the device listens to another device's experience."""
+        return any(
+            self.jid in entity._device_state.listeners
+            for entity in self.hass.data[DATA_BEOPLAY].entities
+            if entity is not self
+        )
+
+    @callback
+    def snapshot(self):
+        """Capture the playback state from the cached state of the speaker."""
+        self._playback_snapshot = PlaybackSnapshot(
+            on=self._device_state.on,
+            source=self._device_state.source,
+            volume=self._device_state.volume_level,
+            muted=self._device_state.is_volume_muted,
+            # listening to another device's experience, restore by joining again
+            in_experience=self._in_experience(),
+        )
+        _LOGGER.debug("Snapshot of %s: %s", self._name, self._playback_snapshot)
+
+    async def async_restore(self):
+        """Restore the snapshot. Source goes before volume, as it may reset it."""
+        snapshot = self._playback_snapshot
+        if snapshot is None:
+            _LOGGER.warning("No snapshot to restore for %s", self._name)
+            return
+        self.cancel_fade()
+        try:
+            if not snapshot.on:
+                await self._speaker.async_standby()
+                return
+            if snapshot.in_experience:
+                await self._speaker.async_join_experience()
+            elif self._in_experience():
+                # joined since the snapshot: the leader may play the same source
+                await self._speaker.async_leave_experience()
+                if snapshot.source:
+                    await self._speaker.async_set_source(snapshot.source)
+            elif snapshot.source and snapshot.source != self._speaker.source:
+                await self._speaker.async_set_source(snapshot.source)
+            if snapshot.volume is not None:
+                await self._speaker.async_set_volume(snapshot.volume)
+            if snapshot.muted is not None:
+                await self._speaker.async_set_mute(snapshot.muted)
+        except (asyncio.TimeoutError, ClientError) as _e:
+            _LOGGER.warning("Couldn't restore %s: %s", self._name, str(_e))
+
+    # ========== Media browser ==========
+
+    async def async_browse_media(self, media_content_type=None, media_content_id=None):
+        """Return a node of the media browser, from the cache when possible.
+
+        Children are expanded lazily: the root only lists the folders, and the
+        play queue is fetched from the device when its folder is opened. The
+        root isn't cached, as the media sources of Home Assistant may change.
+        """
+        content_id = media_content_id or BROWSE_ROOT
+        if media_source.is_media_source_id(content_id):
+            return await media_source.async_browse_media(
+                self.hass, content_id, content_filter=_audio_content
+            )
+        if content_id == BROWSE_ROOT:
+            return await self._async_build_browse_node(BROWSE_ROOT)
+        if content_id not in self._browse_locks:
+            raise BrowseError(f"Media not found: {content_id}")
+        async with self._browse_locks[content_id]:
+            if content_id not in self._browse_cache:
+                self._browse_cache[content_id] = await self._async_build_browse_node(
+                    content_id
+                )
+            return self._browse_cache[content_id]
+
+    async def _async_build_browse_node(self, content_id):
+        """Build a node of the media browser."""
+        if content_id == BROWSE_ROOT:
+            return BrowseMedia(
+                title=self._name,
+                media_class=MediaClass.DIRECTORY,
+                media_content_id=BROWSE_ROOT,
+                media_content_type=MEDIA_TYPE_LIBRARY,
+                can_play=False,
+                can_expand=True,
+                children=[
+                    self._browse_folder(BROWSE_SOURCES, "Sources"),
+                    self._browse_folder(BROWSE_QUEUE, "Play Queue"),
+                    await media_source.async_browse_media(
+                        self.hass, None, content_filter=_audio_content
+                    ),
+                ],
+            )
+        if content_id == BROWSE_SOURCES:
+            folder = self._browse_folder(BROWSE_SOURCES, "Sources")
+            folder.children_media_class = MediaClass.APP
+            folder.children = [
+                BrowseMedia(
+                    title=source,
+                    media_class=MediaClass.APP,
+                    media_content_id=source,
+                    media_content_type=MEDIA_TYPE_SOURCE,
+                    can_play=True,
+                    can_expand=False,
+                )
+                for source in self._speaker.sources
+            ]
+            return folder
+        if content_id == BROWSE_QUEUE:
+            folder = self._browse_folder(BROWSE_QUEUE, "Play Queue")
+            folder.children_media_class = MediaClass.TRACK
+            folder.children = await self._async_get_queue_items()
+            return folder
+        raise BrowseError(f"Media not found: {content_id}")
+
+    @staticmethod
+    def _browse_folder(content_id, title):
+        """Return a folder of the media browser, without its children."""
+        return BrowseMedia(
+            title=title,
+            media_class=MediaClass.DIRECTORY,
+            media_content_id=content_id,
+            media_content_type=MEDIA_TYPE_LIBRARY,
+            can_play=False,
+            can_expand=True,
+        )
+
+    async def _async_get_queue_items(self):
+        """Fetch the play queue of the device."""
+        try:
+            r = await self._speaker.async_getReq(BEOPLAY_URL_PLAYQUEUE)
+        except (asyncio.TimeoutError, ClientError) as _e:
+            raise BrowseError(f"Couldn't fetch the play queue: {_e}") from _e
+        if not r or not isinstance(r.get("playQueue"), dict):
+            return []
+        items = []
+        for item in r["playQueue"].get("playQueueItem", []):
+            media = item.get("track") or item.get("station") or {}
+            images = media.get("image") or []
+            items.append(
+                BrowseMedia(
+                    title=media.get("name", str(item.get("id", ""))),
+                    media_class=MediaClass.TRACK,
+                    media_content_id=str(item.get("id", "")),
+                    media_content_type=MediaType.TRACK,
+                    can_play=False,
+                    can_expand=False,
+                    thumbnail=images[0].get("url") if images else None,
+                )
+            )
+        return items
+
+    @callback
+    def _invalidate_browse_cache(self, notification_type: str):
+        """Drop the cached nodes that a notification may have made stale."""
+        if notification_type == "SOURCE":
+            self._browse_cache.pop(BROWSE_SOURCES, None)
+            self._browse_cache.pop(BROWSE_QUEUE, None)
+        elif notification_type.startswith("PLAY_QUEUE"):
+            self._browse_cache.pop(BROWSE_QUEUE, None)
+
+    # ========== Fleet status ==========
+
+    async def async_get_status(self) -> dict:
+        """Return the health of the device, with a live ping of its latency."""
+        api = self._speaker
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        latency = None
+        ping_error = None
+        try:
+            await api.async_get_standby()
+            latency = round(loop.time() - start, 3)
+        except (asyncio.TimeoutError, ClientError) as _e:
+            ping_error = str(_e) or type(_e).__name__
+        return {
+            "name": self._name,
+            "host": api.host,
+            "power": STATE_ON if self._device_state.on else STATE_OFF,
+            "stream_connected": self._stream_ready.is_set(),
+            "last_notification_age": (
+                round((dt_util.utcnow() - self._last_notification_at).total_seconds())
+                if self._last_notification_at
+                else None
+            ),
+            "requests": api.limiter.requests,
+            # in the last 5 minutes, and since setup
+            "errors": api.limiter.recent_errors,
+            "timeouts": api.recent_timeout_counts,
+            "total_errors": api.limiter.errors,
+            "total_timeouts": dict(api.timeout_counts),
+            "concurrency_limit": api.limiter.limit,
+            "ping_latency": latency,
+            "ping_error": ping_error,
+        }
+
+    # ========== Power group ==========
+
+    async def async_set_power(
+        self, on: bool, wait_ready: bool, deadline: float
+    ) -> dict:
+        """Wake or standby the device, and return how long it took.
+
+        When waking with `wait_ready`, also wait, until the loop time `deadline`,
+        for the device to report an active source on its notification stream.
+        The stream may stay connected in standby, so only a notification
+        received after the command tells that the device woke up.
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        timing = {"command_time": None, "ready_time": None, "error": None}
+        already_awake = self._device_state.on and self._stream_ready.is_set()
+        woken = asyncio.Event()
+        self._wake_waiters.add(woken)
+        try:
+            if on:
+                await self.async_turn_on()
+            else:
+                await self.async_turn_off()
+            timing["command_time"] = round(loop.time() - start, 3)
+            if on and wait_ready:
+                if not already_awake:
+                    async with asyncio.timeout_at(deadline):
+                        await woken.wait()
+                timing["ready_time"] = round(loop.time() - start, 3)
+        except (asyncio.TimeoutError, ClientError) as _e:
+            timing["error"] = str(_e) or type(_e).__name__
+        finally:
+            self._wake_waiters.discard(woken)
+        return timing
+
+    # ========== Notification history ==========
+
+    @callback
+    def notification_history(self, notification_types=None, since=None) -> list:
+        """Return the kept notifications of the given types, received after `since`."""
+        return [
+            {**data, "received_at": received_at.isoformat()}
+            for received_at, data in heapq.merge(
+                self._notifications,
+                self._frequent_notifications,
+                key=lambda notification: notification[0],
+            )
+            if (notification_types is None or data.get("type") in notification_types)
+            and (since is None or received_at > since)
+        ]
 
     # ========== Events ==============
 
@@ -373,9 +1306,7 @@ class BeoPlay(MediaPlayerEntity):
     def group_members(self):
         """Return the group members."""
         entities = self.hass.data[DATA_BEOPLAY].entities
-        listeners = (
-            self._speaker.listeners if hasattr(self._speaker, "listeners") else []
-        )
+        listeners = self._device_state.listeners
         return [entity.entity_id for entity in entities if entity.jid in listeners]
 
     @property
@@ -384,6 +1315,11 @@ class BeoPlay(MediaPlayerEntity):
         # using this polling for the power state
         return True
 
+    @property
+    def command_timeout(self):
+        """Return the deadline of the commands sent to the device, in seconds."""
+        return self._speaker.timeouts[CONF_TIMEOUT_COMMAND]
+
     @property
     def jid(self):
         """Return the JID of the device."""
@@ -397,90 +1333,82 @@ class BeoPlay(MediaPlayerEntity):
     @property
     def state(self):
         """Get the device state."""
-        if not self._on:
-            return STATE_OFF
-        if self._state is None:
-            return None
-
-        if self._state in ("play", "playing"):
-            return STATE_PLAYING
-        if self._state == "pause":
-            return STATE_PAUSED
-        if self._state == "stop":
-            return STATE_PAUSED
-        if self._on:
-            return STATE_ON
-        return STATE_UNKNOWN
+        return self._device_state.state
 
     @property
     def source(self):
         """Return the current input source."""
-        return self._speaker.source if self._speaker.source else None
+        return self._device_state.source
 
     @property
     def source_list(self):
         """List of available input sources."""
-        return self._speaker.sources if self._speaker.sources else None
+        return self._device_state.source_list
 
     @property
     def sound_mode(self):
         """Return the current sound mode."""
-        return self._speaker.soundMode if self._speaker.soundMode else None
+        return self._device_state.sound_mode
 
     @property
     def sound_mode_list(self):
         """List of available sound modes."""
-        return self._speaker.soundModes if self._speaker.soundModes else None
+        return self._device_state.sound_mode_list
 
     @property
     def volume_level(self):
         """Volume level of the media player (0..1)."""
-        return self._speaker.volume
+        return self._device_state.volume_level
 
     @property
     def is_volume_muted(self):
         """Boolean if volume is currently muted."""
-        return self._speaker.muted
+        return self._device_state.is_volume_muted
 
     @property
     def media_content_type(self):
         """Content type of current playing media."""
         return MediaType.MUSIC
 
+    @property
+    def media_position(self):
+        """Position of current playing media in seconds."""
+        return self._device_state.media_position
+
+    @property
+    def media_duration(self):
+        """Duration of current playing media in seconds."""
+        return self._device_state.media_duration
+
+    @property
+    def media_position_updated_at(self):
+        """When the position of current playing media was valid."""
+        return self._device_state.media_position_updated_at
+
     @property
     def media_image_url(self):
         """Image url of current playing media."""
-        if self._speaker.media_url:
-            if self._speaker.source == "AirPlay":
-                media_url_params = urllib.parse.urlencode(
-                    {"track": self._speaker.media_track}
-                )
-                return f"{self._speaker.media_url}?{media_url_params}"
-            return self._speaker.media_url
-        return None
+        return self._device_state.media_image_url
 
     @property
     def media_title(self):
         """Title of current playing media."""
-        if self._speaker.source == "Google Cast":
-            return self._speaker.media_album
-        # return self._speaker.source if self._speaker.source else None
-        return self._speaker.media_track if self._speaker.media_track else None
+        return self._device_state.media_title
 
     @property
     def media_track(self):
         """Track number of current playing media (Music track only)."""
-        return self._speaker.media_track if self._speaker.media_track else None
+        return self._device_state.media_track
 
     @property
     def media_artist(self):
         """Artist of current playing media (Music track only)."""
-        return self._speaker.media_artist if self._speaker.media_artist else None
+        return self._device_state.media_artist
 
     @property
     def media_album(self):
         """Album of current playing media (Music track only)."""
-        return self._speaker.media_album if self._speaker.media_album else None
+        return self._device_state.media_album
 
     @property
     def app_name(self):
@@ -490,105 +1418,92 @@ class BeoPlay(MediaPlayerEntity):
     @property
     def extra_state_attributes(self):
         """Return the state attributes (stand positions)."""
-        attributes = {}
-        attributes["stand_positions"] = self._speaker.standPositions
-        attributes["stand_position"] = self._speaker.standPosition
-        return attributes
+        return self._device_state.extra_state_attributes
 
     # ========== Service Calls ==========
 
-    def turn_on(self):
+    async def async_turn_on(self):
         """Turn on the device."""
-        self._speaker.turnOn()
-
-    def turn_off(self):
+        if not self._speaker.sources:
+            # the device was offline when the lists were fetched
+            await self._speaker.async_get_sources()
+        await self._speaker.async_turn_on()
+        if not self._stream_ready.is_set():
+            # reconnect the notification stream now
+            self._retry_now.set()
+
+    async def async_turn_off(self):
         """Turn off the device."""
-        self._speaker.Standby()
+        await self._speaker.async_standby()
 
-    def media_play(self):
+    async def async_media_play(self):
         """Play the current music."""
-        self._speaker.Play()
+        await self._speaker.async_play()
 
-    def media_pause(self):
+    async def async_media_pause(self):
         """Pause the current music."""
-        self._speaker.Pause()
+        await self._speaker.async_pause()
 
-    def media_stop(self):
+    async def async_media_stop(self):
         """Send stop command."""
-        self._speaker.Stop()
+        await self._speaker.async_stop()
 
-    def media_previous_track(self):
+    async def async_media_previous_track(self):
         """Send previous track command. Will use the type of command appropriate for the device, based on the configuration."""
         if self._beoplay_type == BEOPLAY_CHANNEL:
-            self._speaker.StepDown()
+            await self._speaker.async_stepdown()
         else:
-            self._speaker.Backward()
+            await self._speaker.async_backward()
 
-    def media_next_track(self):
+    async def async_media_next_track(self):
         """Send next track command."""
         if self._beoplay_type == BEOPLAY_CHANNEL:
-            self._speaker.StepUp()
+            await self._speaker.async_stepup()
         else:
-            self._speaker.Forward()
+            await self._speaker.async_forward()
 
-    def set_shuffle(self, shuffle: bool) -> None:
+    async def async_set_shuffle(self, shuffle: bool) -> None:
         """Send previous track command."""
-        self._speaker.Shuffle()
+        await self._speaker.async_shuffle()
 
-    def set_repeat(self, repeat: RepeatMode) -> None:
+    async def async_set_repeat(self, repeat: RepeatMode) -> None:
         """Send next track command."""
-        self._speaker.Repeat()
+        await self._speaker.async_repeat()
 
-    def set_volume_level(self, volume):
+    async def async_set_volume_level(self, volume):
         """Set volume level, range 0..1."""
-        self._speaker.setVolume(volume)
+        await self._speaker.async_set_volume(volume)
 
-    def mute_volume(self, mute):
+    async def async_mute_volume(self, mute):
         """Send mute command."""
-        self._speaker.setMute(mute)
+        await self._speaker.async_set_mute(mute)
 
-    def select_sound_mode(self, sound_mode):
+    async def async_select_sound_mode(self, sound_mode):
         """Select sound mode."""
-        self._speaker.setSoundMode(sound_mode)
+        await self._speaker.async_set_sound_mode(sound_mode)
 
-    def select_source(self, source):
+    async def async_select_source(self, source):
         """Select input source."""
-        self._speaker.setSource(source)
-
-    def join_experience(self):
-        """Join on ongoing experience."""
-        self._speaker.joinExperience()
+        await self._speaker.async_set_source(source)
 
     async def async_join_experience(self):
         """Join on ongoing experience."""
         await self._speaker.async_join_experience()
 
-    def join_players(self, group_members):
+    async def async_join_players(self, group_members):
         """Join `group_members` as a player group with the current player."""
         entities = self.hass.data[DATA_BEOPLAY].entities
 
         entities = [e for e in entities if e.entity_id in group_members]
-        for entity in entities:
-            entity.join_experience()
-
-    def leave_experience(self):
-        """Leave experience."""
-        self._speaker.leaveExperience()
+        await asyncio.gather(*[entity.async_join_experience() for entity in entities])
 
     async def async_leave_experience(self):
         """Leave experience."""
         await self._speaker.async_leave_experience()
 
-    def unjoin_player(self):
+    async def async_unjoin_player(self):
         """Unjoin the current player from the experience."""
-        self.leave_experience()
-
-    def add_media(self, url):
-        """Leave experience."""
-        item = {
-            "playQueueItem": {"behaviour": "impulsive", "track": {"dlna": {"url": url}}}
-        }
-        self._speaker.playQueueItem(False, item)
+        await self.async_leave_experience()
 
     async def async_add_media(self, url):
         """Leave experience."""
@@ -597,9 +1512,70 @@ class BeoPlay(MediaPlayerEntity):
         }
         await self._speaker.async_play_queue_item(False, item)
 
-    def set_stand_position(self, id):
-        """Set the stand position."""
-        self._speaker.setStandPosition(id)
+    async def async_load_queue(self, urls):
+        """Play the first URL, and queue the others in the background.
+
+        Requests to one device are sent one at a time, as the device appends
+        the items to the queue in the order they arrive.
+        """
+        self.cancel_queue_load()
+        await self.async_add_media(urls[0])
+        if len(urls) > 1:
+            self._queue_task = self._hass.async_create_background_task(
+                detached(self._async_queue_media(urls)), BEOPLAY_QUEUE_TASK
+            )
+
+    @callback
+    def cancel_queue_load(self):
+        """Stop loading the queue."""
+        if self._queue_task is not None:
+            self._queue_task.cancel()
+            self._queue_task = None
+
+    async def _async_queue_media(self, urls):
+        """Append urls[1:] to the play queue, firing progress events."""
+        total = len(urls)
+        failed = 0
+        for loaded, url in enumerate(urls[1:], start=2):
+            item = {
+                "playQueueItem": {"behaviour": "planned", "track": {"dlna": {"url": url}}}
+            }
+            try:
+                with background_priority(), request_operation(CONF_TIMEOUT_COMMAND):
+                    await self._speaker.async_play_queue_item(False, item)
+            except (asyncio.TimeoutError, ClientError) as _e:
+                _LOGGER.debug("Couldn't queue %s on %s: %s", url, self._name, str(_e))
+                failed += 1
+            if loaded % QUEUE_PROGRESS_INTERVAL == 0 or loaded == total:
+                self._hass.bus.async_fire(
+                    BEOPLAY_QUEUE_PROGRESS,
+                    {
+                        "entity_id": self.entity_id,
+                        "loaded": loaded - failed,
+                        "failed": failed,
+                        "total": total,
+                    },
+                )
+
+    async def async_play_media(self, media_type, media_id, **kwargs):
+        """Play a source from the media browser, a media source or a media URL."""
+        if media_type == MEDIA_TYPE_SOURCE:
+            await self._speaker.async_set_source(media_id)
+            return
+        if media_source.is_media_source_id(media_id):
+            play_item = await media_source.async_resolve_media(
+                self.hass, media_id, self.entity_id
+            )
+            media_id = play_item.url
+        # relative URLs of Home Assistant aren't reachable from the device
+        media_id = async_process_play_media_url(self.hass, media_id)
+        item = {
+            "playQueueItem": {
+                "behaviour": "impulsive",
+                "track": {"dlna": {"url": media_id}},
+            }
+        }
+        await self._speaker.async_play_queue_item(True, item)
 
     async def async_set_stand_position(self, id):
         """Set the stand position."""
@@ -609,7 +1585,12 @@ class BeoPlay(MediaPlayerEntity):
     async def async_update(self):
         """Get the latest data and update device state."""
         # _LOGGER.debug("Updating")
+        with background_priority():
+            await self._async_update()
 
+    async def _async_update(self):
+        """Get the latest data, behind the commands sent to the device."""
+        refreshed = False
         if self._first_run:
             try:
                 await self._speaker.async_get_device_info()
@@ -626,12 +1607,11 @@ class BeoPlay(MediaPlayerEntity):
                     self._speaker.serialNumber,
                 )
                 self._unique_id = f"beoplay-{self._serial_number}-media_player"
-                await self._speaker.async_get_sources()
-                await self._speaker.async_get_sound_modes()
-                await self._speaker.async_get_stand_positions()
+                await self._async_refresh_catalogues()
+                refreshed = True
                 await self._speaker.async_get_stand_position()
                 self._first_run = False
-            except ClientError:
+            except (asyncio.TimeoutError, ClientError):
                 _LOGGER.error(
                     "Couldn't connect with %s (maybe Wake-On-Lan / Quickstart is disabled?)",
                     self._speaker.host,
@@ -639,8 +1619,27 @@ class BeoPlay(MediaPlayerEntity):
                 return
         try:
             await self._speaker.async_get_standby()
-            if self._on != self._speaker.on:
-                self._on = self._speaker.on
-                _LOGGER.debug("Updating ON state: %s", self._on)
-        except ClientError:
+            # on the first run the lists were just checked, and the state view
+            # still reads as off
+            if not refreshed and (
+                self._catalogues_checked_at is None
+                or (self._speaker.on and not self._device_state.on)
+                or dt_util.utcnow() - self._catalogues_checked_at
+                > CATALOGUE_REFRESH_INTERVAL
+            ):
+                await self._async_refresh_catalogues()
+        except (asyncio.TimeoutError, ClientError):
             _LOGGER.debug("Server disconnected, ignoring")
+        self._apply_device_state()
+
+    async def _async_refresh_catalogues(self):
+        """Re-fetch the sources, sound modes and stand positions that changed."""
+        self._catalogues_checked_at = dt_util.utcnow()
+        with request_operation(CONF_TIMEOUT_METADATA):
+            for path, getter in CATALOGUES:
+                if not await self._speaker.async_get_changed(path):
+                    continue
+                _LOGGER.debug("%s changed on %s", path, self._name)
+                await getattr(self._speaker, getter)()
+                if path == BEOPLAY_URL_GET_SOURCES:
+                    self._browse_cache.pop(BROWSE_SOURCES, None)
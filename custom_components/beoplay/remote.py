@@ -1,90 +1,195 @@
-"""Remote control support for BeoPlay devices."""
-import asyncio
-from collections.abc import Iterable
-import logging
-from typing import Any
-import pybeoplay
-
-from homeassistant.components.remote import (
-    ATTR_DELAY_SECS,
-    ATTR_NUM_REPEATS,
-    DEFAULT_DELAY_SECS,
-    RemoteEntity,
-)
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.entity_platform import AddEntitiesCallback
-
-from .const import DOMAIN, CONF_BEOPLAY_API
-
-_LOGGER = logging.getLogger(__name__)
-
-PARALLEL_UPDATES = 0
-
-
-async def async_setup_entry(
-    hass: HomeAssistant,
-    config_entry: ConfigEntry,
-    async_add_entities: AddEntitiesCallback,
-) -> None:
-    """Load BeoPlay remote based on a config entry."""
-    api = hass.data[DOMAIN][config_entry.entry_id][CONF_BEOPLAY_API]
-    (_, name, _, _)= await api.async_get_device_info()
-
-    _LOGGER.info("remote async setup: %s %s", name,config_entry.unique_id)
-
-    remote = BeoPlayRemote(hass, name, config_entry.unique_id, api)
-    async_add_entities([remote])
-    _LOGGER.info("Added remote with name: %s", remote.name)
-
-
-class BeoPlayRemote(RemoteEntity):
-    """Device that sends commands to a BeoPlay device."""
-
-    def __init__(self, hass: HomeAssistant, name, identifier, api: pybeoplay.BeoPlay):
-        """Initialize device."""
-        self.api = api
-        self._hass = hass
-        self._attr_name = name
-        self._name = name
-
-        self._attr_unique_id = identifier
-        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, identifier)})
-
-    @property
-    def is_api(self):
-        """Return true if device api is there."""
-        return self.api is not None
-
-    async def async_turn_on(self, **kwargs: Any) -> None:
-        """Turn the device on."""
-        await self.api.async_turn_on()
-
-    async def async_turn_off(self, **kwargs: Any) -> None:
-        """Turn the device off."""
-        await self.api.async_standby()
-
-    async def async_send_command(self, command: Iterable[str], **kwargs: Any) -> None:
-        """Send a command to one device."""
-        num_repeats = kwargs[ATTR_NUM_REPEATS]
-        delay = kwargs.get(ATTR_DELAY_SECS, DEFAULT_DELAY_SECS)
-
-        if not self.is_api:
-            _LOGGER.error("Unable to send commands, not connected to %s", self.name)
-            return
-
-        for _ in range(num_repeats):
-            for single_command in command:
-                if single_command in self.api.remote_commands:
-                    _LOGGER.info("Sending command %s", single_command)
-                    await self.api.async_remote_command(single_command)
-                    await asyncio.sleep(delay)
-                elif single_command in self.api.digits:
-                    _LOGGER.info("Sending digit %s", single_command)
-                    await self.api.async_digits(single_command)
-                    await asyncio.sleep(delay)
-                else:
-                    raise ValueError(f"Command '{single_command}' not found. Ending.")
-
-
+"""Remote control support for BeoPlay devices."""
+import asyncio
+from collections.abc import Iterable
+import logging
+from typing import Any
+
+from aiohttp import ClientError
+import pybeoplay
+
+import voluptuous as vol
+
+from homeassistant.components.remote import (
+    ATTR_COMMAND,
+    ATTR_DELAY_SECS,
+    ATTR_HOLD_SECS,
+    ATTR_NUM_REPEATS,
+    ATTR_TIMEOUT,
+    DEFAULT_DELAY_SECS,
+    DEFAULT_HOLD_SECS,
+    RemoteEntity,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.entity_platform import (
+    AddEntitiesCallback,
+    async_get_current_platform,
+)
+
+from .const import DOMAIN, CONF_BEOPLAY_API
+
+_LOGGER = logging.getLogger(__name__)
+
+PARALLEL_UPDATES = 0
+
+BEOPLAY_REMOTE_HOLD_SERVICE = "beoplay_remote_hold"
+BEOPLAY_REMOTE_RELEASE_SERVICE = "beoplay_remote_release"
+BEOPLAY_HOLD_TASK = "BeoPlay Remote Hold Task"
+
+# a held key is released after this many seconds, if not released before
+DEFAULT_HOLD_TIMEOUT = 10
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Load BeoPlay remote based on a config entry."""
+    api = hass.data[DOMAIN][config_entry.entry_id][CONF_BEOPLAY_API]
+    # the device info was fetched when setting up the config entry
+    name = api.name
+
+    _LOGGER.info("remote async setup: %s %s", name,config_entry.unique_id)
+
+    remote = BeoPlayRemote(hass, name, config_entry.unique_id, api)
+    async_add_entities([remote])
+    _LOGGER.info("Added remote with name: %s", remote.name)
+
+    platform = async_get_current_platform()
+    platform.async_register_entity_service(
+        BEOPLAY_REMOTE_HOLD_SERVICE,
+        {
+            vol.Required(ATTR_COMMAND): cv.string,
+            vol.Optional(ATTR_TIMEOUT, default=DEFAULT_HOLD_TIMEOUT): vol.All(
+                vol.Coerce(float), vol.Range(min=0, max=600)
+            ),
+        },
+        "async_hold_command",
+    )
+    platform.async_register_entity_service(
+        BEOPLAY_REMOTE_RELEASE_SERVICE, {}, "async_release_command"
+    )
+
+
+class BeoPlayRemote(RemoteEntity):
+    """Device that sends commands to a BeoPlay device."""
+
+    def __init__(self, hass: HomeAssistant, name, identifier, api: pybeoplay.BeoPlay):
+        """Initialize device."""
+        self.api = api
+        self._hass = hass
+        self._attr_name = name
+        self._name = name
+
+        self._attr_unique_id = identifier
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, identifier)})
+
+        self._held_command = None  # The key currently held down, if any.
+        self._release_task = None  # Releases the held key after the timeout.
+
+    @property
+    def is_api(self):
+        """Return true if device api is there."""
+        return self.api is not None
+
+    async def async_turn_on(self, **kwargs: Any) -> None:
+        """Turn the device on."""
+        await self.api.async_turn_on()
+
+    async def async_turn_off(self, **kwargs: Any) -> None:
+        """Turn the device off."""
+        await self.api.async_standby()
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Don't leave a key held down."""
+        self._cancel_release()
+        try:
+            await self._async_release()
+        except (asyncio.TimeoutError, ClientError):
+            _LOGGER.debug("Couldn't release the held key on %s", self.name)
+
+    async def async_send_command(self, command: Iterable[str], **kwargs: Any) -> None:
+        """Send a command to one device."""
+        num_repeats = kwargs[ATTR_NUM_REPEATS]
+        delay = kwargs.get(ATTR_DELAY_SECS, DEFAULT_DELAY_SECS)
+        hold_secs = kwargs.get(ATTR_HOLD_SECS, DEFAULT_HOLD_SECS)
+
+        if not self.is_api:
+            _LOGGER.error("Unable to send commands, not connected to %s", self.name)
+            return
+
+        for _ in range(num_repeats):
+            for single_command in command:
+                if single_command in self.api.remote_commands and hold_secs:
+                    await self.async_release_command()
+                    _LOGGER.info("Holding command %s", single_command)
+                    await self.api.async_remote_command(single_command, True)
+                    self._held_command = single_command
+                    try:
+                        await asyncio.sleep(hold_secs)
+                    finally:
+                        # also when cancelled, don't leave the key held down
+                        await self._async_release()
+                    await asyncio.sleep(delay)
+                elif single_command in self.api.remote_commands:
+                    _LOGGER.info("Sending command %s", single_command)
+                    await self.api.async_remote_command(single_command)
+                    await asyncio.sleep(delay)
+                elif single_command in self.api.digits:
+                    _LOGGER.info("Sending digit %s", single_command)
+                    await self.api.async_digits(single_command)
+                    await asyncio.sleep(delay)
+                else:
+                    raise ValueError(f"Command '{single_command}' not found. Ending.")
+
+    async def async_hold_command(self, command: str, timeout: float) -> None:
+        """Press and hold a key, until released or until the timeout expires.
+
+        The device repeats a held key at its own rate, so a single request
+        replaces a stream of discrete presses.
+        """
+        if command not in self.api.remote_commands:
+            raise ValueError(f"Command '{command}' not found.")
+        await self.async_release_command()
+
+        _LOGGER.info("Holding command %s", command)
+        await self.api.async_remote_command(command, True)
+        self._held_command = command
+        self._release_task = self._hass.async_create_background_task(
+            self._async_release_after(timeout), BEOPLAY_HOLD_TASK
+        )
+
+    async def async_release_command(self) -> None:
+        """Release the key that is held down."""
+        self._cancel_release()
+        await self._async_release()
+
+    async def _async_release_after(self, timeout: float) -> None:
+        """Release the held key after `timeout` seconds."""
+        await asyncio.sleep(timeout)
+        self._release_task = None
+        try:
+            await self._async_release()
+        except (asyncio.TimeoutError, ClientError) as _e:
+            _LOGGER.warning("Couldn't release the held key on %s: %s", self.name, _e)
+
+    async def _async_release(self) -> None:
+        """Send the release of the held key to the device."""
+        command = self._held_command
+        if command is None:
+            return
+        _LOGGER.info("Releasing command %s", command)
+        await self.api.async_remote_release(command)
+        # kept on failure, so a later release tries again
+        if self._held_command == command:
+            self._held_command = None
+
+    @callback
+    def _cancel_release(self) -> None:
+        """Cancel the release timeout."""
+        if self._release_task is not None:
+            self._release_task.cancel()
+            self._release_task = None